@@ -1,70 +1,321 @@
 import streamlit as st
 import json
 import hashlib
-from cryptography.fernet import Fernet
+import bcrypt
+import base64
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import os
+import mmap
+import tempfile
+from pathlib import Path
+
+try:
+    import orjson # Optional: much faster JSON (de)serialization
+except ImportError:
+    orjson = None
 
 # --- Configuration & Initialization ---
 KEY_FILE = "secret.key"
-DATA_FILE = "data.json"
+LEGACY_KEY_FILE = "secret.key.fernet" # Old Fernet key, kept until its ciphertexts are re-encrypted
+DATA_FILE = "data.log"
+LEGACY_DATA_FILE = "data.json" # Pre-log single-document format, converted on first load
 MAX_ATTEMPTS = 3
+BCRYPT_ROUNDS = 12 # Cost factor for new passkey hashes; stored per record so it can be re-tuned
 
 # --- Cryptography & Hashing Helpers ---
 def generate_key():
-    key = Fernet.generate_key()
+    key = AESGCM.generate_key(bit_length=256) # Raw 32-byte key
     with open(KEY_FILE, "wb") as key_file:
         key_file.write(key)
     return key
 
+@st.cache_resource(show_spinner=False) # The key never changes while the app runs; read it once per process
 def load_key():
     if os.path.exists(KEY_FILE):
-        return open(KEY_FILE, "rb").read()
+        key = open(KEY_FILE, "rb").read()
+        if len(key) == 32:
+            return key
+        try:
+            Fernet(key)
+        except ValueError:
+            return key # Neither key format; get_cipher rejects it below
+        # A base64 Fernet key: set it aside so load_data can re-encrypt the vault
+        os.replace(KEY_FILE, LEGACY_KEY_FILE)
+        st.info(f"Upgrading '{KEY_FILE}' to AES-GCM. The old key is kept in '{LEGACY_KEY_FILE}' until migration completes.")
+        return generate_key()
     else:
         st.info(f"Encryption key file '{KEY_FILE}' not found. Generating a new one.")
         return generate_key()
 
+@st.cache_resource(show_spinner=False)
+def get_cipher(key):
+    """Builds the AES-GCM cipher once per process and key, not on every rerun."""
+    if len(key) != 32:
+        raise ValueError(f"expected a 32-byte AES-256 key, got {len(key)} bytes")
+    return AESGCM(key)
+
 KEY = load_key()
 try:
-    cipher_suite = Fernet(KEY)
+    cipher_suite = get_cipher(KEY)
 except Exception as e:
     st.error(f"Failed to initialize encryption suite. Check your key file. Error: {e}")
     st.stop() # Stop execution if encryption can't be initialized
 
-def hash_passkey(passkey):
-    return hashlib.sha256(passkey.encode()).hexdigest()
+def hash_passkey(passkey, salt):
+    # bcrypt only takes 72 bytes (5.x raises beyond that), so feed it a fixed 44-byte SHA-256 pre-hash
+    prehashed = base64.b64encode(hashlib.sha256(passkey.encode()).digest())
+    return bcrypt.hashpw(prehashed, salt).decode()
+
+def build_hash_index(user_records):
+    """Indexes a user's records for passkey lookup.
+
+    'salts' maps each distinct bcrypt salt to its cost factor; 'legacy' maps the
+    raw 32-byte SHA-256 digest of pre-bcrypt records to their hex record key.
+    """
+    salts = {}
+    legacy = {}
+    for key, item in user_records.items():
+        if "rounds" in item:
+            salts[key[:29].encode()] = item["rounds"] # "$2b$<cost>$" + 22-char salt
+        else:
+            legacy[bytes.fromhex(key)] = key
+    return {'salts': salts, 'legacy': legacy}
+
+def passkey_salt(hash_index):
+    """Returns the user's bcrypt salt for the current cost factor, or a fresh one."""
+    for salt, rounds in hash_index['salts'].items():
+        if rounds == BCRYPT_ROUNDS:
+            return salt
+    return bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+
+def find_record(user_records, hash_index, passkey):
+    """Returns (record unlocked by passkey or None, current-cost bcrypt key).
+
+    Hashes once per distinct salt in the vault. The second value is the key computed
+    for the user's BCRYPT_ROUNDS salt, if one was, so a new record can reuse it.
+    """
+    current_key = None
+    for salt, rounds in hash_index['salts'].items():
+        key = hash_passkey(passkey, salt)
+        if rounds == BCRYPT_ROUNDS:
+            current_key = key
+        data_item = user_records.get(key)
+        if data_item is not None:
+            return data_item, current_key
+    # Records stored before bcrypt were keyed by a plain SHA-256 digest; compare raw bytes, skip hex formatting
+    if hash_index['legacy']:
+        legacy_key = hash_index['legacy'].get(hashlib.sha256(passkey.encode()).digest())
+        if legacy_key is not None:
+            return user_records[legacy_key], current_key
+    return None, current_key
 
 def encrypt_data(text):
-    return cipher_suite.encrypt(text.encode()).decode()
+    nonce = os.urandom(12)
+    return base64.b64encode(nonce + cipher_suite.encrypt(nonce, text.encode(), None)).decode()
 
 def decrypt_data(encrypted_text):
     try:
-        return cipher_suite.decrypt(encrypted_text.encode()).decode()
+        raw = base64.b64decode(encrypted_text)
+        return cipher_suite.decrypt(raw[:12], raw[12:], None).decode()
     except Exception: # Catch specific exceptions in production
         return None # Return None on decryption failure
 
+def record_id(encrypted_text):
+    """Content-addressed record ID: a keyed BLAKE2b tag of the ciphertext."""
+    # BLAKE2b is faster than SHA-256 on 64-bit CPUs; not for passkeys (those use bcrypt)
+    return hashlib.blake2b(encrypted_text.encode(), digest_size=16, key=KEY, person=b"vault-data-id").hexdigest()
+
 # --- Data Persistence Helpers ---
+def json_dumps(obj):
+    """Serializes obj to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+def json_loads(raw):
+    """Parses JSON from bytes; errors are ValueError subclasses either way."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# The vault is an append-only JSON-lines log: one line per stored record,
+# replayed into {user: {passkey_hash: record}} at load time.
+def to_log_record(user, hashed_pk, item):
+    rec = {"user": user, "hash": hashed_pk, "ct": item["encrypted_text"], "id": item["data_id"]}
+    if "rounds" in item:
+        rec["rounds"] = item["rounds"]
+    return rec
+
+def apply_log_record(data, rec):
+    item = {"encrypted_text": rec["ct"], "data_id": rec["id"]}
+    if "rounds" in rec:
+        item["rounds"] = rec["rounds"]
+    data.setdefault(rec["user"], {})[rec["hash"]] = item
+
+def iter_log_lines(path):
+    """Yields the log's lines from a read-only mmap, so the file is never buffered whole."""
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # An empty file can't be mapped
+            return
+        except OSError: # Filesystem without mmap support
+            yield from f.read().splitlines()
+            return
+        with mm:
+            yield from iter(mm.readline, b'')
+
 def load_data():
     if os.path.exists(DATA_FILE):
+        data = {}
+        line_count = 0
+        skipped = 0
+        for line in iter_log_lines(DATA_FILE):
+            if not line.strip():
+                continue
+            line_count += 1
+            try:
+                apply_log_record(data, json_loads(line))
+            except (ValueError, KeyError): # ValueError covers json and orjson decode errors
+                skipped += 1 # e.g. a torn final line from an interrupted write
+        if skipped:
+            st.error(f"Skipped {skipped} unreadable record(s) in '{DATA_FILE}'. Check file integrity.")
+        # Rewrite a clean log if any line was unreadable, or compact if the log
+        # has grown well past the records it holds
+        needs_rewrite = bool(skipped) or line_count > 2 * sum(len(records) for records in data.values())
+    elif os.path.exists(LEGACY_DATA_FILE):
         try:
-            with open(DATA_FILE, 'r') as f:
-                content = f.read()
-                return json.loads(content) if content else {}
-        except json.JSONDecodeError:
-            st.error(f"Error reading '{DATA_FILE}'. Starting fresh or check file integrity.")
+            raw = Path(LEGACY_DATA_FILE).read_bytes()
+            data = migrate_data(json_loads(raw)) if raw else {}
+        except ValueError:
+            st.error(f"Error reading '{LEGACY_DATA_FILE}'. Starting fresh or check file integrity.")
             return {}
+        needs_rewrite = True # One-time conversion to the log format
     else:
-        return {}
+        data = {}
+        needs_rewrite = False
 
-def save_data(data):
+    has_legacy_key = os.path.exists(LEGACY_KEY_FILE) and reencrypt_legacy_data(data)
+    # The old key is only discarded once the re-encrypted vault is safely on disk
+    if (needs_rewrite or has_legacy_key) and save_data(data) and has_legacy_key:
+        os.remove(LEGACY_KEY_FILE)
+    return data
+
+def reencrypt_legacy_data(data):
+    """Re-encrypts Fernet ciphertexts from before the AES-GCM switch with the current key.
+
+    Returns False, leaving the vault untouched, if the old key can't be used.
+    """
+    try:
+        legacy_cipher = Fernet(open(LEGACY_KEY_FILE, "rb").read())
+    except ValueError as e:
+        st.error(f"Cannot read legacy key '{LEGACY_KEY_FILE}'; old records stay unreadable. Error: {e}")
+        return False
+    for records in data.values():
+        for item in records.values():
+            if item["encrypted_text"].startswith("gAAAAA"): # Fernet version byte 0x80
+                try:
+                    item["encrypted_text"] = encrypt_data(legacy_cipher.decrypt(item["encrypted_text"].encode()).decode())
+                except InvalidToken:
+                    pass # Already AES-GCM, or unreadable under the old key too
+    return True
+
+def migrate_data(data):
+    """Rebuilds old-format vaults ({data_id: {..., "passkey_hash"}}) keyed by passkey hash."""
+    for user, records in data.items():
+        if any("passkey_hash" in item for item in records.values()):
+            migrated = {}
+            for data_id, item in records.items():
+                # First match wins, as the old linear scan did
+                migrated.setdefault(item["passkey_hash"], {"encrypted_text": item["encrypted_text"], "data_id": data_id})
+            data[user] = migrated
+    return data
+
+def data_file_stamp():
+    """Identifies the log's current contents; every append changes its size."""
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        stat = os.stat(DATA_FILE)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_data_cached(stamp):
+    """Parses the log once per version for all sessions; each caller gets its own copy."""
+    return load_data()
+
+def get_store():
+    """Returns the vault cached in session state, reloading only when the log changed on disk."""
+    stamp = data_file_stamp()
+    if 'stored_data' not in st.session_state or st.session_state.stored_data_stamp != stamp:
+        st.session_state.stored_data = load_data_cached(stamp)
+        st.session_state.stored_data_stamp = data_file_stamp() # Loading may migrate or compact
+    return st.session_state.stored_data
+
+def get_hash_index(user):
+    """Returns the user's passkey lookup index, cached in session state until the vault changes."""
+    index = st.session_state.get('user_hash_index')
+    if index is None or index['user'] != user or index['stamp'] != st.session_state.stored_data_stamp:
+        index = build_hash_index(st.session_state.stored_data.get(user, {}))
+        index['user'] = user
+        index['stamp'] = st.session_state.stored_data_stamp
+        st.session_state.user_hash_index = index
+    return index
+
+def append_record(user, hashed_pk, item):
+    """Appends a single stored record to the log. Only render_store writes records."""
+    try:
+        stamp_before = data_file_stamp()
+        line = json_dumps(to_log_record(user, hashed_pk, item)) + b'\n'
+        with open(DATA_FILE, 'a+b') as f: # Writes still always append
+            # Don't glue this record onto a torn final line from an interrupted write
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = b'\n' + line
+            f.write(line)
+            f.flush()
+            stat_after = os.fstat(f.fileno())
+        # The cached vault already holds this record, so skip the reload, but only if the
+        # log grew by exactly this line; otherwise another session appended too. The new
+        # stamp comes from the same fstat, so a later append by anyone else still differs
+        size_before = stamp_before[1] if stamp_before else 0
+        if st.session_state.get('stored_data_stamp') == stamp_before and stat_after.st_size == size_before + len(line):
+            st.session_state.stored_data_stamp = (stat_after.st_mtime_ns, stat_after.st_size)
+        return True
     except IOError as e:
         st.error(f"Failed to save data to '{DATA_FILE}'. Error: {e}")
+        return False
 
-st.set_page_config(page_title="Secure Vault", layout="centered")
+def save_data(data):
+    """Rewrites the whole log from data; used for compaction and migration only."""
+    tmp_path = None
+    try:
+        # Serialize up front so the rewrite is a single write() call
+        payload = b''.join(
+            json_dumps(to_log_record(user, hashed_pk, item)) + b'\n'
+            for user, records in data.items()
+            for hashed_pk, item in records.items()
+        )
+        # Write a synced temp file and rename it over the log, so a crash never leaves a torn vault
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(DATA_FILE) or '.', delete=False) as f:
+            tmp_path = f.name
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DATA_FILE)
+        return True
+    except IOError as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        st.error(f"Failed to save data to '{DATA_FILE}'. Error: {e}")
+        return False
 
-st.markdown("""
+# --- Styling ---
+# Streamlit drops any element a rerun doesn't re-emit, so the stylesheet is sent every run;
+# keeping it a module constant means it's built once at compile time, not per render.
+APP_CSS = """
 <style>
     /* Main app styling */
     .main .block-container {
@@ -119,9 +370,13 @@ st.markdown("""
     h2, h3 { color: #555; margin-top: 1rem; }
     label { font-weight: 500; color: #495057; }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-stored_data = load_data()
+st.set_page_config(page_title="Secure Vault", layout="centered")
+
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+stored_data = get_store()
 
 # Initialize session state variables
 if 'logged_in_user' not in st.session_state:
@@ -156,12 +411,9 @@ def render_login():
         if submitted_login:
             if username_login:
                 st.session_state.logged_in_user = username_login
-                # Initialize or reset user attempt state
-                if username_login not in st.session_state.login_attempts:
-                    st.session_state.login_attempts[username_login] = {'attempts': 0, 'locked': False}
-                else:
-                    st.session_state.login_attempts[username_login]['locked'] = False # Unlock on login
-                    st.session_state.login_attempts[username_login]['attempts'] = 0 # Reset attempts on login
+                get_hash_index(username_login) # Build the passkey lookup index once per login
+                # Initialize or reset user attempt state (unlocks on login)
+                st.session_state.login_attempts[username_login] = {'attempts': 0, 'locked': False}
                 st.success(f"Welcome, {username_login}!")
                 navigate_to("Home")
             else:
@@ -190,9 +442,8 @@ def render_home():
              navigate_to("Retrieve")
 
     if st.button("🚪 Logout", key="logout_home", type="secondary"): # Use a unique key
-         # Reset attempts and lock status on logout
-         if user in st.session_state.login_attempts:
-            st.session_state.login_attempts[user] = {'attempts': 0, 'locked': False}
+         # Reset attempts and lock status on logout; a missing entry reads as unlocked
+         st.session_state.login_attempts.pop(user, None)
          st.session_state.logged_in_user = None
          navigate_to("Login")
 
@@ -211,18 +462,25 @@ def render_store():
 
         if submitted_store:
             if data_to_store and passkey_store:
-                hashed_pk = hash_passkey(passkey_store)
-                encrypted_dt = encrypt_data(data_to_store)
+                user_records = stored_data.setdefault(user, {}) # Initialize user's storage
+
+                hash_index = get_hash_index(user)
 
-                if user not in stored_data:
-                    stored_data[user] = {} # Initialize user's storage
+                existing_item, hashed_pk = find_record(user_records, hash_index, passkey_store)
+                if existing_item is not None:
+                    st.warning("This Passkey Is Already In Use. Please Choose A Different One.")
+                else:
+                    if hashed_pk is None: # No current-cost salt yet, so the duplicate check didn't hash with it
+                        hashed_pk = hash_passkey(passkey_store, passkey_salt(hash_index))
+                    encrypted_dt = encrypt_data(data_to_store)
 
-                # Simple data ID generation (can be improved)
-                data_id = f"data_{len(stored_data.get(user, {})) + 1}"
-                stored_data[user][data_id] = {"encrypted_text": encrypted_dt, "passkey_hash": hashed_pk}
+                    data_id = record_id(encrypted_dt)
+                    item = {"encrypted_text": encrypted_dt, "data_id": data_id, "rounds": BCRYPT_ROUNDS}
 
-                save_data(stored_data) # Save to JSON
-                st.success("Data Encrypted And Stored Successfully!")
+                    # Only keep the record in the cached vault once it is safely in the log
+                    if append_record(user, hashed_pk, item):
+                        user_records[hashed_pk] = item
+                        st.success("Data Encrypted And Stored Successfully!")
             else:
                 st.warning("Please Provide Both Data And A Passkey.")
 
@@ -252,36 +510,30 @@ def render_retrieve():
 
                 if submitted_retrieve:
                     if passkey_retrieve:
-                        hashed_input_pk = hash_passkey(passkey_retrieve)
-                        found_data = False
-
-                        for data_id, data_item in stored_data.get(user, {}).items():
-                            if data_item["passkey_hash"] == hashed_input_pk:
-                                decrypted_text = decrypt_data(data_item["encrypted_text"])
-                                if decrypted_text is not None:
-                                    st.subheader("Decrypted Data:")
-                                    st.success(f"```\n{decrypted_text}\n```") # Use success box and code block
-                                    user_attempts_state['attempts'] = 0 # Reset attempts on success
-                                    found_data = True
-                                    break # Assume one passkey decrypts one item for simplicity
-                                else:
-                                    st.error("Decryption Failed. Data Might Be Corrupted Or Key Changed.")
-                                    found_data = True # Indicate an attempt was made on a matching hash
-                                    break
-
-                        if not found_data:
+                        # Records are keyed by passkey hash, so a match is one bcrypt hash + dict lookup
+                        data_item, _ = find_record(stored_data.get(user, {}), get_hash_index(user), passkey_retrieve)
+                        if data_item is not None:
+                            decrypted_text = decrypt_data(data_item["encrypted_text"])
+                            if decrypted_text is not None:
+                                st.subheader("Decrypted Data:")
+                                st.success(f"```\n{decrypted_text}\n```") # Use success box and code block
+                                user_attempts_state['attempts'] = 0 # Reset attempts on success
+                            else:
+                                st.error("Decryption Failed. Data Might Be Corrupted Or Key Changed.")
+                        else:
                             user_attempts_state['attempts'] += 1
                             attempts = user_attempts_state['attempts']
                             st.warning(f"Incorrect Passkey. Attempt {attempts} of {MAX_ATTEMPTS}.")
 
                             if attempts >= MAX_ATTEMPTS:
                                 user_attempts_state['locked'] = True
-                                st.error(f"Maximum Attempts Reached! Account Locked.")
+                                st.error("Maximum Attempts Reached! Account Locked.")
                                 # Force re-login - user must explicitly log out and back in via Home/Login page now
                                 # We don't automatically navigate away here to show the locked message
                                 st.rerun() # Rerun to update UI state based on lock
 
-                        # Update the main session state dictionary
+                        # Update the main session state dictionary. Attempt counters are session-only:
+                        # retrieval never writes to the vault, so failed attempts cost no disk I/O
                         st.session_state.login_attempts[user] = user_attempts_state
 
                     else: